@@ -97,14 +97,12 @@ def search_sig(sig, prn, data, fs, fi, max_dop, zero_pad):
     fds = sdr_func.dop_bins(T, 0.0, max_dop)
     
     # parallel code search and non-coherent integration
-    P = np.zeros((len(fds), N), dtype='float32')
-    for i in range(0, len(data) - len(code_fft) + 1, N):
-        P += sdr_func.search_code(code_fft, T, data, i, fs, fi, fds)
+    P = sdr_func.search_code_sum(code_fft, T, data, fs, fi, fds)
     
     # max correlation power and C/N0
     P_max, ix, cn0 = sdr_func.corr_max(P, T)
     
-    coffs = np.arange(0, T, 1.0 / fs, dtype='float32')
+    coffs = sdr_func.coff_bins(T, fs, 'float32')
     dop = sdr_func.fine_dop(P.T[ix[1]], fds, ix[0])
     
     return P / P_max, fds, coffs, ix, cn0, dop
@@ -87,9 +87,7 @@ def search_sig(data, sig, sys, prn, dif, fs, fi, rrate):
         fds = sdr_func.dop_bins(T, dop, MAX_DFREQ)
     
     # parallel code search
-    P = np.zeros((len(fds), N), dtype='float32')
-    for i in range(0, len(dif) - len(code_fft[sat]) + 1, N):
-        P += sdr_func.search_code(code_fft[sat], T, dif, i, fs, fi, fds)
+    P = sdr_func.search_code_sum(code_fft[sat], T, dif, fs, fi, fds)
     
     # max correlation power
     P_max, ix, cn0 = sdr_func.corr_max(P, T)
@@ -97,7 +95,7 @@ def search_sig(data, sig, sys, prn, dif, fs, fi, rrate):
     if cn0 >= THRES_CN0:
         dop = sdr_func.fine_dop(P.T[ix[1]], fds, ix[0])
         rrate = -dop * CLIGHT / sdr_code.sig_freq(sig)
-        coff = fine_coff(sig, fs, P[ix[0]], np.arange(0, T, 1.0 / fs), ix[1])
+        coff = fine_coff(sig, fs, P[ix[0]], sdr_func.coff_bins(T, fs), ix[1])
         if VERP:
             print('%s : SIG=%-5s C/N0=%5.1f dB-Hz DOP=%9.3f Hz COFF=%12.9f ms' %
                 (satno2id(sat), sig, cn0, dop, coff * 1e3))
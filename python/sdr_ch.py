@@ -8,6 +8,8 @@
 #  2021-12-24  1.0  new
 #  2022-01-13  1.1  support tracking of L6D, L6E
 #  2022-02-15  1.2  update ch state by external trigger
+#  2026-10-15  1.3  use float32 for non-coherent sum of corr. powers
+#                   reuse buffer of correlation powers in acquisition
 #
 from math import *
 import numpy as np
@@ -114,7 +116,8 @@ def acq_new(code, T, fs, N, max_dop):
     acq = Obj()
     acq.code_fft = sdr_code.gen_code_fft(code, T, 0.0, fs, N, N) # (code + ZP) DFT
     acq.fds = dop_bins(T, 0.0, max_dop)  # Doppler search bins
-    acq.P_sum = np.zeros((len(acq.fds), N)) # non-coherent sum of corr. powers
+    acq.P_sum = np.zeros((len(acq.fds), N), dtype='float32') # non-coherent sum of corr. powers
+    acq.P = np.empty_like(acq.P_sum) # correlation powers buffer
     acq.n_sum = 0                   # number of non-coherent sum
     return acq
 
@@ -152,8 +155,9 @@ def search_sig(ch, time, buff, ix):
     ch.time = time
     
     # parallel code search and non-coherent integration
-    ch.acq.P_sum += search_code(ch.acq.code_fft, ch.T, buff, ix, ch.fs, ch.fi,
-        ch.acq.fds)
+    search_code(ch.acq.code_fft, ch.T, buff, ix, ch.fs, ch.fi, ch.acq.fds,
+        out=ch.acq.P)
+    np.add(ch.acq.P_sum, ch.acq.P, out=ch.acq.P_sum)
     ch.acq.n_sum += 1
     
     if ch.acq.n_sum * ch.T >= T_ACQ:
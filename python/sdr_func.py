@@ -16,13 +16,38 @@
 #                   support np.fromfile() without offset option
 #  2023-12-27  1.6  support API changes of sdr_func.c
 #  2024-04-04  1.7  support API changes of sdr_func.c
+#  2026-10-15  1.8  use np.packbits() for pack_bits()
+#                   use np.unpackbits() for unpack_bits()
+#                   vectorize unpack_data()
+#                   use int.bit_count() for xor_bits()
+#                   use bytes.hex() for hex_str()
+#                   set argtypes of libsdr functions at loading library
+#                   share data DFT among Doppler bins in search_code()
+#                   use scipy.fft instead of scipy.fftpack
+#                   batch inverse FFTs over Doppler bins in search_code()
+#                   reduce temporary arrays in mix_carr()
+#                   use Numba JIT for corr_std_() if available
+#                   add API read_data_iq(), mix_carr_iq()
+#                   read IF data file by memory-map
+#                   add option M of corr_fft() for number of outputs
+#                   cache Doppler bins, code offsets and carrier tables
+#                   add API coff_bins()
+#                   add option out of search_code()
+#                   add API search_code_sum()
+#                   compute correlation powers without abs() in search_code()
+#                   share N_THREAD between threads and FFT workers
+#                   search code by tiles of Doppler bins in search_code_sum()
+#                   use closed-form parabolic interpolation in fine_dop()
+#                   reduce temporary arrays in pack_bits(), unpack_bits()
 #
 from math import *
 from ctypes import *
 import time, os, re, platform
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import numpy as np
 from numpy import ctypeslib
-import scipy.fftpack as fft
+import scipy.fft as fft
 import sdr_code, sdr_rtk
 
 # load external library --------------------------------------------------------
@@ -42,15 +67,36 @@ except:
 else:
     libsdr.sdr_func_init.argtypes = (c_char_p,)
     libsdr.sdr_func_init(''.encode())
+    libsdr.sdr_corr_std_cpx.argtypes = [
+        ctypeslib.ndpointer('complex64'), c_int32, c_int32, c_int32,
+        c_double, c_double, c_double, ctypeslib.ndpointer('float32'),
+        ctypeslib.ndpointer('int32'), c_int32,
+        ctypeslib.ndpointer('complex64')]
+    libsdr.sdr_corr_std_cpx.restype = None
+    libsdr.sdr_corr_fft_cpx.argtypes = [
+        ctypeslib.ndpointer('complex64'), c_int32, c_int32, c_int32,
+        c_double, c_double, c_double, ctypeslib.ndpointer('complex64'),
+        ctypeslib.ndpointer('complex64')]
+    libsdr.sdr_corr_fft_cpx.restype = None
+    libsdr.sdr_psd_cpx.argtypes = [
+        ctypeslib.ndpointer('complex64'), c_int32, c_int32, c_double, c_int32,
+        ctypeslib.ndpointer('float32')]
+    libsdr.sdr_psd_cpx.restype = None
 
 # constants --------------------------------------------------------------------
 DOP_STEP = 0.5     # Doppler frequency search step (* 1 / code cycle)
 LIBSDR_ENA = True  # enable flag of LIBSDR
+if hasattr(os, 'sched_getaffinity'): # number of threads for parallel search
+    N_THREAD = len(os.sched_getaffinity(0))
+else:
+    N_THREAD = os.cpu_count() or 1
+SEARCH_TILE_BYTES = 8 << 20 # max size of Doppler bins tile per search thread
+IFFT_BATCH_BYTES = 1 << 20 # max size of batched inverse FFT in search_code()
 
 # global variable --------------------------------------------------------------
-carr_tbl = []      # carrier lookup table 
 log_lvl = 3        # log level
 log_str = None     # log stream
+corr_std_nb = None # Numba JIT standard correlator (None: not loaded)
 
 #-------------------------------------------------------------------------------
 #  Read digitalized IF (inter-frequency) data from file. Supported file format
@@ -68,20 +114,53 @@ log_str = None     # log stream
 #      data     Digitized IF data as complex64 ndarray (length == 0: read error)
 #
 def read_data(file, fs, IQ, T, toff=0.0):
+    raw = read_raw(file, fs, IQ, T, toff)
+    
+    if IQ == 1: # I-sampling
+        return np.array(raw, dtype='complex64')
+    else: # IQ-sampling (Q sign inverted)
+        n = len(raw) // 2
+        data = np.empty(n, dtype='complex64')
+        data.real = raw[0:n*2:2]
+        data.imag = raw[1:n*2:2]
+        data.imag *= -1.0
+        return data
+
+#-------------------------------------------------------------------------------
+#  Read digitalized IF (inter-frequency) data from file as separate I and Q
+#  sample arrays. See read_data() for the file format.
+#
+#  args:
+#      file     (I) Digitalized IF data file path
+#      fs       (I) Sampling frequency (Hz)
+#      IQ       (I) Sampling type (1: I-sampling, 2: IQ-sampling)
+#      T        (I) Sample period (s)
+#      toff=0.0 (I) Time offset from the beginning (s) (optional)
+#
+#  returns:
+#      I, Q     Digitized IF data I and Q as float32 ndarrays (Q = 0 for
+#               I-sampling) (length == 0: read error)
+#
+def read_data_iq(file, fs, IQ, T, toff=0.0):
+    raw = read_raw(file, fs, IQ, T, toff)
+    
+    if IQ == 1: # I-sampling
+        return np.array(raw, dtype='float32'), np.zeros(len(raw), dtype='float32')
+    else: # IQ-sampling (Q sign inverted)
+        n = len(raw) // 2
+        return (np.array(raw[0:n*2:2], dtype='float32'),
+            -np.array(raw[1:n*2:2], dtype='float32'))
+
+# read raw IF data as memory-mapped int8 ndarray -------------------------------
+def read_raw(file, fs, IQ, T, toff=0.0):
     off = int(fs * toff * IQ)
     cnt = int(fs * T * IQ) if T > 0.0 else -1 # all if T=0.0
+    size = os.path.getsize(file) - off
     
-    f = open(file, 'rb')
-    f.seek(off, os.SEEK_SET)
-    raw = np.fromfile(f, dtype=np.int8, count=cnt)
-    f.close()
-    
-    if len(raw) < cnt:
-        return np.array([], dtype='complex64')
-    elif IQ == 1: # I-sampling
-        return np.array(raw, dtype='complex64')
-    else: # IQ-sampling
-        return np.array(raw[0::2] - raw[1::2] * 1j, dtype='complex64')
+    if size <= 0 or size < cnt:
+        return np.array([], dtype='int8')
+    return np.memmap(file, dtype='int8', mode='r', offset=off,
+        shape=(size if cnt < 0 else cnt,))
 
 #-------------------------------------------------------------------------------
 #  Parallel code search in digitized IF data.
@@ -94,18 +173,93 @@ def read_data(file, fs, IQ, T, toff=0.0):
 #      fs       (I) Sampling frequency (Hz)
 #      fi       (I) IF frequency (Hz)
 #      fds      (I) Doppler frequency bins as ndarray (Hz)
+#      out=None (O) Output buffer of P as float32 2D-ndarray (optional)
 #
 #  returns:
 #      P        Correlation powers in the Doppler frequencies - Code offset
-#               space as float32 2D-ndarray
+#               space as float32 2D-ndarray (out if specified)
+#
+def search_code(code_fft, T, buff, ix, fs, fi, fds, out=None):
+    N = int(fs * T)
+    P = np.empty((len(fds), N), dtype='float32') if out is None else out
+    
+    if libsdr and LIBSDR_ENA:
+        for i in range(len(fds)):
+            C = corr_fft(buff, ix, len(code_fft), fs, fi + fds[i], 0.0, code_fft, N)
+            P[i] = C.real * C.real + C.imag * C.imag
+    else:
+        # Doppler frequencies as DFT bin shifts (integer + residual)
+        L = len(code_fft)
+        s = np.round(np.asarray(fds) * L / fs, 6)
+        k = np.floor(s).astype('int')
+        r = s - k
+        k %= L
+        
+        # batch of inverse FFTs of shifted data DFTs limited by IFFT_BATCH_BYTES
+        M = min(max(IFFT_BATCH_BYTES // (L * 8), 1), len(fds))
+        X = np.empty((M, L), dtype='complex64')
+        
+        for r_j in np.unique(r):
+            # mix carrier of residual and share data DFT among the bins
+            data_fft = fft.fft(mix_carr(buff, ix, L, fs, fi + r_j * fs / L, 0.0))
+            idx = np.where(r == r_j)[0]
+            for m in range(0, len(idx), M):
+                i = idx[m:m+M]
+                X_i = X[:len(i)]
+                for n in range(len(i)): # circular shift by k bins
+                    X_i[n, :L-k[i[n]]] = data_fft[k[i[n]]:]
+                    X_i[n, L-k[i[n]]:] = data_fft[:k[i[n]]]
+                np.multiply(X_i, code_fft, out=X_i)
+                C = fft.ifft(X_i, axis=-1, overwrite_x=True)[:, :N]
+                p = C.real * C.real
+                p += C.imag * C.imag
+                p *= 1.0 / L / L
+                P[i] = p
+    return P
+
+#-------------------------------------------------------------------------------
+#  Parallel code search and non-coherent integration of correlation powers over
+#  all code cycles in digitized IF data. The Doppler bins are split into tiles
+#  of up to SEARCH_TILE_BYTES of powers searched by N_THREAD threads. Each
+#  thread sums all the code cycles into its own rows of the output. libsdr and
+#  scipy.fft release the GIL and all the tables shared by search_code() are
+#  read-only, so the threads run in parallel. If there are fewer tiles than
+#  N_THREAD, the rest of the threads are used as scipy.fft workers.
+#
+#  args:
+#      code_fft (I) Code DFT (with or w/o zero-padding)
+#      T        (I) Code cycle (period) (s)
+#      buff     (I) Buffer of IF data as complex64 ndarray
+#      fs       (I) Sampling frequency (Hz)
+#      fi       (I) IF frequency (Hz)
+#      fds      (I) Doppler frequency bins as ndarray (Hz)
+#
+#  returns:
+#      P        Sum of correlation powers in the Doppler frequencies - Code
+#               offset space as float32 2D-ndarray
 #
-def search_code(code_fft, T, buff, ix, fs, fi, fds):
+def search_code_sum(code_fft, T, buff, fs, fi, fds):
     N = int(fs * T)
     P = np.zeros((len(fds), N), dtype='float32')
+    ixs = range(0, len(buff) - len(code_fft) + 1, N)
+    M = max(min(SEARCH_TILE_BYTES // (N * 4), -(-len(fds) // N_THREAD)), 1) # bins per tile
+    tiles = range(0, len(fds), M)
+    n = max(min(N_THREAD, len(tiles)), 1)
+    
+    def search_tile(i):
+        P_tile = P[i:i+M]
+        P_blk = np.empty_like(P_tile)
+        with fft.set_workers(max(N_THREAD // n, 1)): # thread-local setting
+            for ix in ixs:
+                search_code(code_fft, T, buff, ix, fs, fi, fds[i:i+M], out=P_blk)
+                np.add(P_tile, P_blk, out=P_tile)
     
-    for i in range(len(fds)):
-        C = corr_fft(buff, ix, len(code_fft), fs, fi + fds[i], 0.0, code_fft)[:N]
-        P[i] = np.abs(C) ** 2
+    if n <= 1:
+        for i in tiles:
+            search_tile(i)
+    else:
+        with ThreadPoolExecutor(max_workers=n) as ex:
+            list(ex.map(search_tile, tiles))
     return P
 
 # max correlation power and C/N0 -----------------------------------------------
@@ -120,8 +274,11 @@ def corr_max(P, T):
 def fine_dop(P, fds, ix):
     if ix == 0 or ix == len(fds) - 1:
         return fds[ix]
-    p = np.polyfit(fds[ix-1:ix+2], P[ix-1:ix+2], 2)
-    return -p[1] / (2.0 * p[0])
+    y0, y1, y2 = float(P[ix-1]), float(P[ix]), float(P[ix+1])
+    d = y0 - 2.0 * y1 + y2
+    if d == 0.0:
+        return fds[ix]
+    return fds[ix] + 0.5 * (y0 - y2) / d * (fds[ix+1] - fds[ix])
 
 # shift IF frequency for GLONASS FDMA ------------------------------------------
 def shift_freq(sig, fcn, fi):
@@ -131,9 +288,19 @@ def shift_freq(sig, fcn, fi):
         fi += 0.4375e6 * fcn
     return fi
 
-# doppler search bins ----------------------------------------------------------
+# doppler search bins (cached, read-only) --------------------------------------
+@lru_cache(maxsize=32)
 def dop_bins(T, dop, max_dop):
-    return np.arange(dop - max_dop, dop + max_dop + DOP_STEP / T, DOP_STEP / T)
+    fds = np.arange(dop - max_dop, dop + max_dop + DOP_STEP / T, DOP_STEP / T)
+    fds.setflags(write=False)
+    return fds
+
+# code offset bins (cached, read-only) -----------------------------------------
+@lru_cache(maxsize=32)
+def coff_bins(T, fs, dtype='float64'):
+    coffs = np.arange(0, T, 1.0 / fs, dtype=dtype)
+    coffs.setflags(write=False)
+    return coffs
 
 # mix carrier and standard correlator ------------------------------------------
 def corr_std(buff, ix, N, fs, fc, phi, code, pos):
@@ -141,11 +308,6 @@ def corr_std(buff, ix, N, fs, fc, phi, code, pos):
         corr = np.empty(len(pos), dtype='complex64')
         code_real = np.array(code.real, dtype='float32')
         pos = np.array(pos, dtype='int32')
-        libsdr.sdr_corr_std_cpx.argtypes = [
-            ctypeslib.ndpointer('complex64'), c_int32, c_int32, c_int32,
-            c_double, c_double, c_double, ctypeslib.ndpointer('float32'),
-            ctypeslib.ndpointer('int32'), c_int32,
-            ctypeslib.ndpointer('complex64')]
         libsdr.sdr_corr_std_cpx(buff, len(buff), ix, N, fs, fc, phi, code_real,
             pos, len(pos), corr)
         return corr
@@ -153,32 +315,61 @@ def corr_std(buff, ix, N, fs, fc, phi, code, pos):
         data = mix_carr(buff, ix, N, fs, fc, phi)
         return corr_std_(data, code, pos)
 
-# mix carrier and FFT correlator -----------------------------------------------
-def corr_fft(buff, ix, N, fs, fc, phi, code_fft):
+# mix carrier and FFT correlator (M: number of outputs, 0: N) ------------------
+def corr_fft(buff, ix, N, fs, fc, phi, code_fft, M=0):
     if libsdr and LIBSDR_ENA:
         corr = np.empty(N, dtype='complex64')
-        libsdr.sdr_corr_fft_cpx.argtypes = [
-            ctypeslib.ndpointer('complex64'), c_int32, c_int32, c_int32,
-            c_double, c_double, c_double, ctypeslib.ndpointer('complex64'),
-            ctypeslib.ndpointer('complex64')]
         libsdr.sdr_corr_fft_cpx(buff, len(buff), ix, N, fs, fc, phi, code_fft,
             corr)
-        return corr
+        return corr[:M] if M > 0 else corr
     else:
         data = mix_carr(buff, ix, N, fs, fc, phi)
-        return corr_fft_(data, code_fft)
+        return corr_fft_(data, code_fft, M)
 
 # mix carrier ------------------------------------------------------------------
 def mix_carr(buff, ix, N, fs, fc, phi):
-    global carr_tbl
-    if len(carr_tbl) == 0:
-        carr_tbl = np.array(np.exp(-2j * np.pi * np.arange(256) / 256),
-                       dtype='complex64')
-    i = ((fc / fs * np.arange(N) + phi) * 256).astype('uint8')
-    return buff[ix:ix+N] * carr_tbl[i]
+    return buff[ix:ix+N] * carr_tbl(256)[0][carr_idx(N, fs, fc, phi)]
+
+# mix carrier for separate I and Q ---------------------------------------------
+def mix_carr_iq(I, Q, ix, N, fs, fc, phi):
+    i = carr_idx(N, fs, fc, phi)
+    _, cos_t, sin_t = carr_tbl(256)
+    cos_c, sin_c = cos_t[i], sin_t[i]
+    I, Q = I[ix:ix+N], Q[ix:ix+N]
+    return I * cos_c + Q * sin_c, Q * cos_c - I * sin_c
+
+# carrier lookup table index ---------------------------------------------------
+def carr_idx(N, fs, fc, phi):
+    p = np.multiply(samp_idx(N), fc / fs * 256.0)
+    p += fmod(phi, 1.0) * 256.0
+    i = np.floor(p, out=p).astype('int64')
+    np.bitwise_and(i, 255, out=i) # phase index (mod 256)
+    return i
+
+# carrier lookup tables of exp(-j*theta), cos and sin (cached, read-only) ------
+@lru_cache(maxsize=4)
+def carr_tbl(n):
+    tbl = np.array(np.exp(-2j * np.pi * np.arange(n) / n), dtype='complex64')
+    tbls = (tbl, np.array(tbl.real), np.array(-tbl.imag))
+    for t in tbls:
+        t.setflags(write=False)
+    return tbls
+
+# sample index table (cached, read-only) ---------------------------------------
+@lru_cache(maxsize=32)
+def samp_idx(N):
+    idx = np.arange(N, dtype='float64')
+    idx.setflags(write=False)
+    return idx
 
 # standard correlator ----------------------------------------------------------
 def corr_std_(data, code, pos):
+    if load_corr_std_nb():
+        corr = np.empty(len(pos), dtype='complex64')
+        corr_std_nb(np.ascontiguousarray(data, dtype='complex64'),
+            np.ascontiguousarray(code, dtype='complex64'),
+            np.array(pos, dtype='int64'), corr)
+        return corr
     N = len(data)
     corr = np.zeros(len(pos), dtype='complex64')
     for i in range(len(pos)):
@@ -190,18 +381,49 @@ def corr_std_(data, code, pos):
             corr[i] = np.dot(data, code) / N
     return corr
 
-# FFT correlator ---------------------------------------------------------------
-def corr_fft_(data, code_fft):
-    return fft.ifft(fft.fft(data) * code_fft) / len(data)
+# standard correlator kernel for Numba JIT ------------------------------------
+_prange = range # set to numba.prange by load_corr_std_nb()
+
+def corr_std_ker(data, code, pos, corr):
+    N = len(data)
+    for k in _prange(len(pos)):
+        p = pos[k]
+        s = np.complex64(0.0)
+        if p >= 0:
+            for i in range(N - p):
+                s += data[p+i] * code[i]
+            corr[k] = s / (N - p)
+        else:
+            for i in range(N + p):
+                s += data[i] * code[i-p]
+            corr[k] = s / (N + p)
+
+# load Numba JIT standard correlator at first use (False: no Numba) ------------
+def load_corr_std_nb():
+    global corr_std_nb, _prange
+    if corr_std_nb is None:
+        try:
+            import numba
+        except:
+            corr_std_nb = False
+        else:
+            # Numba resolves globals of the kernel at compile time, so the
+            # parallel loop must see numba.prange there, not the range above
+            _prange = numba.prange
+            corr_std_nb = numba.njit(parallel=True, fastmath=True, cache=True)(
+                corr_std_ker)
+    return corr_std_nb
+
+# FFT correlator (M: number of outputs, 0: all) --------------------------------
+def corr_fft_(data, code_fft, M=0):
+    corr = fft.ifft(fft.fft(data) * code_fft)
+    return (corr[:M] if M > 0 else corr) / len(data)
 
 # PSD of IF data ---------------------------------------------------------------
 def psd(data, N, fs, IQ):
     if not libsdr and LIBSDR_ENA:
         return []
     psd = np.zeros(N if IQ == 2 else N // 2, dtype='float32')
-    libsdr.sdr_psd_cpx.argtypes = [
-        ctypeslib.ndpointer('complex64'), c_int32, c_int32, c_double, c_int32,
-        ctypeslib.ndpointer('float32')]
     libsdr.sdr_psd_cpx(np.array(data, 'complex64'), len(data), N, fs, IQ, psd)
     return psd
 
@@ -264,35 +486,48 @@ def add_buff(buff, item):
 
 # pack bits to uint8 ndarray ---------------------------------------------------
 def pack_bits(data, nz=0):
+    data = np.asarray(data, dtype='uint8')
     if nz > 0:
-        data = np.hstack([[0] * nz, data])
-    N = len(data)
-    buff = np.zeros((N + 7) // 8, dtype='uint8')
-    for i in range(N):
-        buff[i // 8] |= (data[i] << (7 - i % 8))
-    return buff
+        buff = np.zeros(nz + len(data), dtype='uint8')
+        buff[nz:] = data
+        data = buff
+    return np.packbits(data) # zero-padded at the end
 
 # unpack uint8 ndarray to bits ------------------------------------------------
 def unpack_bits(data, N):
-    buff = np.zeros(N, dtype='uint8')
-    for i in range(np.min([N, len(data) * 8])):
-        buff[i] = (data[i // 8] >> (7 - i % 8)) & 1
-    return buff
+    data = np.asarray(data, dtype='uint8')
+    if len(data) == 0: # count of np.unpackbits() is not reliable for empty data
+        return np.zeros(N, dtype='uint8')
+    return np.unpackbits(data, count=N) # zero-padded
 
 # unpack data to bits ----------------------------------------------------------
 def unpack_data(data, N):
-    buff = np.zeros(N, dtype='uint8')
-    for i in range(N):
-        buff[i] = (data >> (N - 1 - i)) & 1
-    return buff
+    if N > 63: # exceeds int64
+        buff = np.zeros(N, dtype='uint8')
+        for i in range(N):
+            buff[i] = (data >> (N - 1 - i)) & 1
+        return buff
+    shift = np.arange(N - 1, -1, -1, dtype='int64')
+    return ((np.int64(int(data) & ((1 << N) - 1)) >> shift) & 1).astype('uint8')
 
 # exclusive-or of all bits ------------------------------------------------------
-def xor_bits(X):
-    return bin(X).count('1') % 2
+if hasattr(int, 'bit_count'): # Python 3.10+
+    def xor_bits(X):
+        return int(X).bit_count() & 1
+else:
+    def xor_bits(X):
+        X = abs(int(X))
+        while X >> 32:
+            X = (X >> 32) ^ (X & 0xFFFFFFFF)
+        X ^= X >> 16
+        X ^= X >> 8
+        X ^= X >> 4
+        X ^= X >> 2
+        X ^= X >> 1
+        return X & 1
 
 # hex string --------------------------------------------------------------------
 def hex_str(data):
-    str = ''
-    for i in range(len(data)):
-        str += '%02X' % (data[i])
-    return str
+    if not isinstance(data, (bytes, bytearray)):
+        data = np.asarray(data, dtype='uint8').tobytes()
+    return data.hex().upper()
@@ -202,6 +202,86 @@ def test_06():
         
         print('%6d  %8.4f %8.4f %8.4f' % (N, t1, t2, t3))
 
+# test mix_carr_iq() -----------------------------------------------------------
+def test_07():
+    fs = 24e6
+    fc = 1350.0
+    phi = 45.4234
+    
+    for N in (3000, 6000, 12000, 24000, 48000, 96000, 192000):
+        data = gen_data(N)
+        
+        data_carr1 = sdr_func.mix_carr(data, 0, N, fs, fc, phi)
+        I, Q = sdr_func.mix_carr_iq(np.array(data.real), np.array(data.imag),
+            0, N, fs, fc, phi)
+        
+        d = np.abs(data_carr1.real - I)
+        e = np.abs(data_carr1.imag - Q)
+        
+        if np.all(d < 2e-6) and np.all(e < 2e-6):
+            print('test_07: OK N=%6d err_max=%9.7f %9.7f' % (N, np.max(d), np.max(e)))
+        else:
+            print('test_07: NG N=%6d err_max=%9.7f %9.7f' % (N, np.max(d), np.max(e)))
+
+# test search_code() -----------------------------------------------------------
+def test_08():
+    fs = 12e6
+    T = 1e-3
+    N = int(fs * T)
+    code = sdr_code.gen_code('L1CA', 5)
+    
+    for L, fc in ((N, 0.0), (N * 2, 0.0), (N * 2, 137.3)):
+        fd = fc + 1234.5
+        buff = sdr_func.mix_carr(sdr_code.res_code(code, T, 0.3e-3, fs, N * 2) +
+            gen_data(N * 2) * 2.0, 0, N * 2, fs, -fd, 0.0)
+        code_fft = sdr_code.gen_code_fft(code, T, 0.0, fs, N, L - N)
+        fds = sdr_func.dop_bins(T, fc, 5000.0)
+        
+        sdr_func.LIBSDR_ENA = False
+        P1 = sdr_func.search_code(code_fft, T, buff, 0, fs, 0.0, fds)
+        P2 = np.zeros((len(fds), N), dtype='float32')
+        for i in range(len(fds)):
+            P2[i] = np.abs(sdr_func.corr_fft(buff, 0, L, fs, fds[i], 0.0,
+                code_fft, N))**2
+        
+        ok = np.argmax(P1) == np.argmax(P2)
+        d = np.max(np.abs(P1 - P2)) / np.max(P2)
+        
+        if ok and d < 1e-3:
+            print('test_08: OK L=%6d fc=%6.1f err_max=%9.7f' % (L, fc, d))
+        else:
+            print('test_08: NG L=%6d fc=%6.1f err_max=%9.7f' % (L, fc, d))
+
+# test search_code_sum() -------------------------------------------------------
+def test_09():
+    fs = 12e6
+    T = 1e-3
+    N = int(fs * T)
+    code = sdr_code.gen_code('L1CA', 5)
+    buff = sdr_func.mix_carr(sdr_code.res_code(code, T, 0.3e-3, fs, N * 10) +
+        gen_data(N * 10) * 2.0, 0, N * 10, fs, -1234.5, 0.0)
+    n_thread = sdr_func.N_THREAD
+    
+    for L in (N, N * 2):
+        code_fft = sdr_code.gen_code_fft(code, T, 0.0, fs, N, L - N)
+        fds = sdr_func.dop_bins(T, 0.0, 5000.0)
+        
+        sdr_func.LIBSDR_ENA = False
+        P1 = np.zeros((len(fds), N), dtype='float32')
+        for ix in range(0, len(buff) - len(code_fft) + 1, N):
+            P1 += sdr_func.search_code(code_fft, T, buff, ix, fs, 0.0, fds)
+        
+        for n in (1, 3, 8):
+            sdr_func.N_THREAD = n
+            P2 = sdr_func.search_code_sum(code_fft, T, buff, fs, 0.0, fds)
+            
+            if np.array_equal(P1, P2):
+                print('test_09: OK L=%6d N_THREAD=%d' % (L, n))
+            else:
+                print('test_09: NG L=%6d N_THREAD=%d err_max=%9.7f' % (L, n,
+                    np.max(np.abs(P1 - P2))))
+    sdr_func.N_THREAD = n_thread
+
 # test main --------------------------------------------------------------------
 if __name__ == '__main__':
     test_01()
@@ -210,4 +290,7 @@ if __name__ == '__main__':
     test_04()
     #test_05()
     test_06()
+    test_07()
+    test_08()
+    test_09()
 